@@ -13,8 +13,9 @@ from __future__ import print_function
 
 import os
 import sys
-import math 
-import time 
+import math
+import time
+from functools import lru_cache
 import datetime as datetime
 import pandas as pd
 
@@ -27,6 +28,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
 import stat_tools_attractor as st
 
 def linear_rescaling(value, oldmin, oldmax, newmin, newmax):
@@ -39,13 +45,17 @@ def to_dB(array, offset=-1):
     Transform array to dB
     '''
     isList = isinstance(array, list)
-    if isList == True:
-        array = np.array(array)
+    array = np.asarray(array, dtype=np.float64)
+
+    # Compute in place on a single output buffer to avoid the intermediate temporaries
+    dBarray = np.empty_like(array)
     if offset != -1:
-        dBarray = 10.0*np.log10(array + offset)
+        np.add(array, offset, out=dBarray)
+        np.log10(dBarray, out=dBarray)
     else:
-        dBarray = 10.0*np.log10(array)
-        
+        np.log10(array, out=dBarray)
+    np.multiply(dBarray, 10.0, out=dBarray)
+
     if isList == True:
         dBarray = dBarray.tolist()
     return(dBarray)
@@ -69,28 +79,28 @@ def rainrate2reflectivity(rainrate, A=316.0, b=1.5, zerosDBZ='auto'):
     isList = isinstance(rainrate, list)
     if isList == True:
         rainrate = np.array(rainrate)
-        
-    zerosIdx = rainrate == 0
+
     rainIdx = rainrate > 0
-    
+
     # Compute or set minimum reflectivity
-    nrRainPixels = np.sum(rainIdx)
+    nrRainPixels = np.count_nonzero(rainIdx)
     if nrRainPixels >= 10:
         minRainRate = np.min(rainrate[rainIdx])
     else:
         minRainRate = 0.012 # 0.0115537519713
     minDBZ = 10.0*np.log10(A*minRainRate**b)
-    
+
     if type(rainrate) == np.ndarray and not np.isscalar(rainrate):
-        # Compute reflectivity
-        dBZ = rainrate.copy()
-        dBZ[rainIdx] = 10.0*np.log10(A*rainrate[rainIdx]**b)
-        
-        # Replace zero rainrate by the minimum observed reflectivity or set it by hand to a fixed value
-        if zerosDBZ == 'auto':
-            dBZ[zerosIdx] = minDBZ
-        else:
-            dBZ[zerosIdx] = zerosDBZ
+        # Compute reflectivity in a single vectorized pass: zero rain rates are
+        # clamped to the minimum rain rate (mapping them onto minDBZ), while
+        # NaN and negative (noData) pixels pass through unchanged
+        computeIdx = rainrate >= 0
+        dBZ = 10.0*np.log10(A*np.where(rainIdx, rainrate, minRainRate)**b)
+        dBZ = np.where(computeIdx, dBZ, rainrate)
+
+        # Set zero rainrate by hand to a fixed value if asked
+        if zerosDBZ != 'auto':
+            dBZ[rainrate == 0] = zerosDBZ
     else:
         if rainrate != 0.0:
             dBZ = 10.0*np.log10(A*rainrate**b)
@@ -111,21 +121,60 @@ def reflectivity2rainrate(reflectivityDBZ, zeroDBZ=0.0, A=316.0, b=1.5):
     
     return(rainrate)
   
-def get_rainfall_lookuptable(noData, A=316.0, b=1.5):
+def _compute_base_lookuptable(A, b):
     precipIdxFactor=71.5
-    lut = np.zeros(256)
-    for i in range(0,256):
-        if (i < 2) or (i > 250 and i < 255):
-            lut[i] = 0.0
-        elif (i == 255):
-            lut[i] = noData
-        else:
-            lut[i] = (10.**((i-(precipIdxFactor))/20.0)/A)**(1.0/b)
-    
+    i = np.arange(256)
+    lut = (10.**((i-(precipIdxFactor))/20.0)/A)**(1.0/b)
+    lut[(i < 2) | (i > 250)] = 0.0
+    return lut
+
+# Precompute the constant part of the table once at import (only lut[255]=noData varies between calls)
+_BASE_LUT = _compute_base_lookuptable(A=316.0, b=1.5)
+
+@lru_cache(maxsize=8)
+def get_rainfall_lookuptable(noData, A=316.0, b=1.5):
+    if (A == 316.0) and (b == 1.5):
+        lut = _BASE_LUT.copy()
+    else:
+        lut = _compute_base_lookuptable(A, b)
+    lut[255] = noData
+
+    # The table is memoized across calls: mark it read-only (take a .copy() to modify it)
+    lut.setflags(write=False)
     return lut
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _apply_lut_jit(imageFlat, lut):
+        out = np.empty(imageFlat.size, np.float64)
+        for k in prange(imageFlat.size):
+            out[k] = lut[imageFlat[k]]
+        return out
+else:
+    _apply_lut_jit = None
+
+def apply_precip_lut(image, lut):
+    '''
+    Apply a 256-entry rainfall lookup table (cf. get_rainfall_lookuptable) to an image of uint8 indices.
+    Uses a parallel numba gather kernel when numba is available, otherwise NumPy fancy indexing.
+    '''
+    image = np.asarray(image)
+    if image.dtype != np.uint8:
+        image = image.astype(np.uint8)
+    lut = np.ascontiguousarray(lut, dtype=np.float64)
+
+    if _apply_lut_jit is not None:
+        rainrate = _apply_lut_jit(image.ravel(), lut).reshape(image.shape)
+    else:
+        rainrate = lut[image]
+
+    return rainrate
 #########
     
 def get_column_list(list2D, columnNr):
+    # ndarray inputs: return the column as a zero-copy view
+    if isinstance(list2D, np.ndarray):
+        return(list2D[:, columnNr])
     listColumn = [item[columnNr] for item in list2D]
     return(listColumn)
 
@@ -147,14 +196,13 @@ def get_variable_indices(subsetVariableNames, listVariableNames):
         else:
             listVariableNames = [listVariableNames]
     
-    nrVarTot = len(listVariableNames)
-    nrVarSubset = len(subsetVariableNames)
+    # Build the name->index mapping once for O(1) lookups (list.index is O(N) per variable)
+    nameToIndex = {}
+    for index, var in enumerate(listVariableNames):
+        if var not in nameToIndex:
+            nameToIndex[var] = index
 
-    indices = []
-    for item in range(0,nrVarSubset):
-        var = subsetVariableNames[item]
-        index = listVariableNames.index(var)
-        indices.append(index)
+    indices = [nameToIndex[var] for var in subsetVariableNames]
     return(indices)
 
 def get_reduced_extent(width, height, domainSizeX, domainSizeY):
@@ -188,42 +236,15 @@ def extract_middle_domain_img(demImg, domainSizeX, domainSizeY):
     return(demImgCropped)
 
 def extract_middle_domain(rainfield, domainSizeX, domainSizeY):
-    borderSizeX = int((rainfield.shape[1] - domainSizeX)/2)
-    borderSizeY = int((rainfield.shape[0] - domainSizeY)/2)
-    mask = np.ones((rainfield.shape))
-    mask[0:borderSizeY,:] = 0
-    mask[borderSizeY+domainSizeY:,:] = 0
-    mask[:,0:borderSizeX] = 0
-    mask[:,borderSizeX+domainSizeX:] = 0
-    
-    rainfieldDomain = rainfield[mask==1].reshape(domainSizeY,domainSizeX)
-    
+    borderSizeX = (rainfield.shape[1] - domainSizeX)//2
+    borderSizeY = (rainfield.shape[0] - domainSizeY)//2
+
+    rainfieldDomain = rainfield[borderSizeY:borderSizeY+domainSizeY, borderSizeX:borderSizeX+domainSizeX]
+
     return(rainfieldDomain)
-
-def get_colorlist(type='MeteoSwiss', units='R'):
-    if type == 'STEPS':
-        color_list = ['cyan','deepskyblue','dodgerblue','blue','chartreuse','limegreen','green','darkgreen','yellow','gold','orange','red','magenta','darkmagenta']
-        if units == 'R':
-            clevs = [0.1,0.25,0.4,0.63,1,1.6,2.5,4,6.3,10,16,25,40,63,100]
-        elif units == 'dBZ':
-            clevs = np.arange(-10,70,5)
-        else:
-            print('Wrong units in get_colorlist')
-            sys.exit(1)
-    if type == 'MeteoSwiss':
-        pinkHex = '#%02x%02x%02x' % (232, 215, 242)
-        redgreyHex = '#%02x%02x%02x' % (156, 126, 148)
-        color_list = [pinkHex, redgreyHex, "#640064","#AF00AF","#DC00DC","#3232C8","#0064FF","#009696","#00C832",
-        "#64FF00","#96FF00","#C8FF00","#FFFF00","#FFC800","#FFA000","#FF7D00","#E11900"] # light gray "#D3D3D3"
-        if units == 'R':
-            clevs= [0,0.08,0.16,0.25,0.40,0.63,1,1.6,2.5,4,6.3,10,16,25,40,63,100,160]
-        elif units == 'dBZ':
-            clevs = np.arange(-10,70,5)
-        else:
-            print('Wrong units in get_colorlist')
-            sys.exit(1)
-    
-    # Color level strings    
+
+def _format_clevs(clevs):
+    # Color level strings
     clevsStr = []
     for i in range(0,len(clevs)):
         if (clevs[i] < 10) and (clevs[i] >= 1):
@@ -232,7 +253,39 @@ def get_colorlist(type='MeteoSwiss', units='R'):
             clevsStr.append(str('%.2f' % clevs[i]))
         else:
             clevsStr.append(str('%i' % clevs[i]))
-        
+    return clevsStr
+
+def _build_colorlists():
+    colorlists = {}
+
+    stepsColors = ['cyan','deepskyblue','dodgerblue','blue','chartreuse','limegreen','green','darkgreen','yellow','gold','orange','red','magenta','darkmagenta']
+    pinkHex = '#%02x%02x%02x' % (232, 215, 242)
+    redgreyHex = '#%02x%02x%02x' % (156, 126, 148)
+    meteoswissColors = [pinkHex, redgreyHex, "#640064","#AF00AF","#DC00DC","#3232C8","#0064FF","#009696","#00C832",
+    "#64FF00","#96FF00","#C8FF00","#FFFF00","#FFC800","#FFA000","#FF7D00","#E11900"] # light gray "#D3D3D3"
+
+    clevsR = {'STEPS': [0.1,0.25,0.4,0.63,1,1.6,2.5,4,6.3,10,16,25,40,63,100],
+    'MeteoSwiss': [0,0.08,0.16,0.25,0.40,0.63,1,1.6,2.5,4,6.3,10,16,25,40,63,100,160]}
+
+    for colormapType, color_list in (('STEPS', stepsColors), ('MeteoSwiss', meteoswissColors)):
+        for units in ('R', 'dBZ'):
+            if units == 'R':
+                clevs = clevsR[colormapType]
+            else:
+                clevs = np.arange(-10,70,5)
+            colorlists[(colormapType, units)] = (color_list, clevs, _format_clevs(clevs))
+
+    return colorlists
+
+# Precompute the color lists and level strings once at import
+_COLORLISTS = _build_colorlists()
+
+def get_colorlist(type='MeteoSwiss', units='R'):
+    if (type, units) not in _COLORLISTS:
+        print('Wrong units in get_colorlist')
+        sys.exit(1)
+
+    color_list, clevs, clevsStr = _COLORLISTS[(type, units)]
     return(color_list, clevs, clevsStr)
 
 def dynamic_formatting_floats(floatArray):
@@ -325,18 +378,9 @@ def myLogFormat(y,pos):
     return formatstring.format(y)
     
 def create_sparse_grid(gridSpacing, nrRows, nrCols):
-    xSub = []
-    ySub = []
-    for i in range(0,nrRows):
-        for j in range(0,nrCols):
-            if ((i % gridSpacing) == 0) & ((j % gridSpacing) == 0):
-                xSub.append(j)
-                ySub.append(i)
-                
-    xSub = np.asarray(xSub)
-    ySub = np.asarray(ySub)
-    
-    return(xSub, ySub)
+    ySub, xSub = np.meshgrid(np.arange(0, nrRows, gridSpacing), np.arange(0, nrCols, gridSpacing), indexing='ij')
+
+    return(xSub.ravel(), ySub.ravel())
 
 def cart2pol(x, y):
     rho = np.sqrt(x**2 + y**2)
@@ -1158,4 +1202,4 @@ def interp_missing_HZT(fieldHZT, missingData_metranet=6362.5, missingData_netcdf
         field_raw_interp = field_raw
         
     return(field_raw_interp, percMissing, boolMissing)
-    
+    